@@ -5,10 +5,17 @@ Programmatically manipulate pixel art assets using procedural transformations.
 """
 
 import os
-import sys
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from PIL import Image, ImageTransform
-import argparse
+import numpy as np
+from PIL import Image
+
+try:
+    from pyspng import encode as spng_encode, ProgressiveMode
+except ImportError:  # pyspng is optional; PIL encodes PNGs without it
+    spng_encode = None
 
 # =============================================================================
 # TUNABLE PARAMETERS FOR DIAGONAL GENERATION
@@ -22,7 +29,8 @@ DIAGONAL_SHEAR_AMOUNT = 0.15  # Horizontal shear for diagonal directions (0.15 =
 
 def process_image(image_path):
     """
-    Load an image as RGBA, preserving pixel art integrity.
+    Load an image as RGBA, preserving pixel art integrity. This is the
+    single place loaded images are converted to RGBA.
 
     Args:
         image_path: Path to the image file
@@ -41,20 +49,37 @@ def process_image(image_path):
         return None
 
 
-def save_image(img, output_path, preserve_pixel_art=True):
+def save_image(img, output_path, preserve_pixel_art=True, fast=False, ensure_dir=True):
     """
     Save an image, preserving pixel art quality.
 
     Args:
-        img: PIL.Image to save
+        img: PIL.Image or RGBA np.ndarray to save
         output_path: Destination path
         preserve_pixel_art: If True, use PNG with no compression artifacts
+        fast: If True, use the fastest zlib level (larger files, much cheaper
+            encode) - intended for batch runs
+        ensure_dir: If False, skip creating the output directory (batch
+            callers create all of theirs up front)
     """
     # Ensure output directory exists
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if ensure_dir:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Save as PNG to preserve transparency and pixel-perfect quality
-    img.save(output_path, 'PNG', optimize=False)
+    compress_level = 1 if fast else 6
+
+    if spng_encode is not None and (isinstance(img, np.ndarray) or img.mode == 'RGBA'):
+        # libspng encodes 8-bit RGBA considerably faster than PIL's libpng path
+        data = spng_encode(np.ascontiguousarray(img), ProgressiveMode.NONE, compress_level)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    else:
+        # Pipelines stay in NumPy until here
+        if isinstance(img, np.ndarray):
+            img = Image.fromarray(img, 'RGBA')
+        img.save(output_path, 'PNG', optimize=False, compress_level=compress_level)
+
     print(f"[OK] Saved: {output_path}")
 
 
@@ -62,6 +87,55 @@ def save_image(img, output_path, preserve_pixel_art=True):
 # RECOLOR MODULE - Palette Swapping
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def _get_palette_kernel():
+    """
+    Import Numba and build the palette-swap kernel on first use, so importing
+    this module stays cheap. Returns None when Numba is not installed.
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:  # Numba is optional; the NumPy path is used without it
+        return None
+
+    @njit(parallel=True, cache=True)
+    def _palette_swap_kernel(arr, old_colors, new_color):
+        """Replace matching RGB values in-place in a single fused pass; returns the match count."""
+        height, width, _ = arr.shape
+        changed = 0
+        for y in prange(height):
+            for x in range(width):
+                r = arr[y, x, 0]
+                g = arr[y, x, 1]
+                b = arr[y, x, 2]
+                for k in range(old_colors.shape[0]):
+                    if r == old_colors[k, 0] and g == old_colors[k, 1] and b == old_colors[k, 2]:
+                        arr[y, x, 0] = new_color[0]
+                        arr[y, x, 1] = new_color[1]
+                        arr[y, x, 2] = new_color[2]
+                        changed += 1
+                        break
+        return changed
+
+    return _palette_swap_kernel
+
+
+@lru_cache(maxsize=4)
+def _color_lut(old_colors):
+    """
+    Build a lookup table over all 2^24 packed RGB keys marking the colors to
+    replace. Memoized per palette, so a batch builds it once per process.
+
+    Args:
+        old_colors: Tuple of RGB tuples
+    """
+    lut = np.zeros(1 << 24, dtype=bool)
+    for r, g, b in old_colors:
+        lut[(r << 16) | (g << 8) | b] = True
+    lut.flags.writeable = False
+    return lut
+
+
 def apply_palette_swap(image, old_colors, new_color):
     """
     Replace specific colors in an image with a new color.
@@ -72,30 +146,77 @@ def apply_palette_swap(image, old_colors, new_color):
         new_color: RGB tuple for the replacement color (r,g,b)
 
     Returns:
-        PIL.Image: Modified image
+        PIL.Image: Modified image, or `image` itself when no pixel matches
     """
-    # Convert image to pixel data
-    pixels = image.load()
-    width, height = image.size
+    old_colors = tuple(tuple(color) for color in old_colors)
+
+    # LPC art uses a small palette: when the sheet has at most 256 distinct
+    # colors, PIL reports them from C and sheets without any old color are skipped
+    palette = image.getcolors(maxcolors=256)
+    if palette is not None:
+        present = {color[:3] for _, color in palette}
+        if present.isdisjoint(old_colors):
+            return image
+
+    # Work on a copy of the raw RGBA buffer (H, W, 4)
+    arr = np.array(image, dtype=np.uint8, copy=True)
+
+    kernel = _get_palette_kernel()
+    if kernel is not None:
+        # Compiled single pass over the pixels, writing in place
+        changed = kernel(
+            arr,
+            np.array(old_colors, dtype=np.uint8).reshape(-1, 3),
+            np.array(new_color, dtype=np.uint8)
+        )
+        if not changed:
+            return image
+        return Image.fromarray(arr, 'RGBA')
 
-    # Create output image
-    output = image.copy()
-    output_pixels = output.load()
+    # Pack each pixel's RGB into a single 24-bit key and look every pixel
+    # up in the palette's prebuilt table in one pass over the image
+    rgb = arr[..., :3].astype(np.uint32)
+    keys = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    mask = _color_lut(old_colors)[keys]
+    if not mask.any():
+        return image
 
-    # Convert old_colors list to set for faster lookup
-    old_colors_set = set(old_colors)
+    # Preserve alpha, replace RGB
+    arr[mask, 0] = new_color[0]
+    arr[mask, 1] = new_color[1]
+    arr[mask, 2] = new_color[2]
 
-    # Iterate through all pixels
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = pixels[x, y]
+    return Image.fromarray(arr, 'RGBA')
 
-            # Check if pixel color matches any old color
-            if (r, g, b) in old_colors_set:
-                # Preserve alpha, replace RGB
-                output_pixels[x, y] = (new_color[0], new_color[1], new_color[2], a)
 
-    return output
+def _init_recolor_worker():
+    """Keep the Numba kernel single-threaded; the process pool already uses every core."""
+    if _get_palette_kernel() is not None:
+        from numba import set_num_threads
+        set_num_threads(1)
+
+
+def _recolor_one(task):
+    """
+    Recolor a single sprite file. Module-level so it can run in a worker process.
+
+    Args:
+        task: Tuple of (source_file, output_file, old_colors, new_color)
+    """
+    img_file, output_file, old_colors, new_color = task
+
+    img = process_image(img_file)
+    if img is None:
+        return
+
+    recolored = apply_palette_swap(img, old_colors, new_color)
+    if recolored is img:
+        # No pixel matched: copy the source file rather than re-encoding it
+        shutil.copyfile(img_file, output_file)
+        print(f"[OK] Copied (no matching colors): {output_file}")
+        return
+
+    save_image(recolored, output_file, fast=True, ensure_dir=False)
 
 
 def generate_recolor_variant(source_folder, output_folder, old_colors, new_color):
@@ -125,21 +246,21 @@ def generate_recolor_variant(source_folder, output_folder, old_colors, new_color
         print(f"Warning: No PNG files found in {source_folder}")
         return
 
-    for img_file in png_files:
-        # Preserve relative path structure
-        relative_path = img_file.relative_to(source_path)
-        output_file = output_path / relative_path
-
-        # Process image
-        img = process_image(img_file)
-        if img is None:
-            continue
+    # Preserve relative path structure; colors as tuples so tasks pickle cleanly
+    old_colors = tuple(tuple(color) for color in old_colors)
+    new_color = tuple(new_color)
+    tasks = [
+        (img_file, output_path / img_file.relative_to(source_path), old_colors, new_color)
+        for img_file in png_files
+    ]
 
-        # Apply palette swap
-        recolored = apply_palette_swap(img, old_colors, new_color)
+    # Create each output directory once up front instead of once per file
+    for directory in {task[1].parent for task in tasks}:
+        directory.mkdir(parents=True, exist_ok=True)
 
-        # Save with same filename
-        save_image(recolored, output_file)
+    # Files are independent, so spread them across all cores
+    with ProcessPoolExecutor(initializer=_init_recolor_worker) as executor:
+        list(executor.map(_recolor_one, tasks, chunksize=8))
 
     print(f"\n[SUCCESS] Recoloring complete! Processed {len(png_files)} file(s).")
 
@@ -153,12 +274,17 @@ def extract_sprite_row(image, row_index):
     Extract a single row from an LPC 4-row sprite sheet.
 
     Args:
-        image: PIL.Image (LPC format sprite sheet with 4 rows)
+        image: PIL.Image or np.ndarray (LPC format sprite sheet with 4 rows)
         row_index: Row to extract (0=S/Down, 1=W/Left, 2=N/Up, 3=E/Right)
 
     Returns:
-        PIL.Image: Single row extracted
+        PIL.Image or np.ndarray: Single row extracted (arrays are sliced as a
+        zero-copy view)
     """
+    if isinstance(image, np.ndarray):
+        row_height = image.shape[0] // 4
+        return image[row_index * row_height:(row_index + 1) * row_height]
+
     width, height = image.size
     row_height = height // 4
 
@@ -169,6 +295,61 @@ def extract_sprite_row(image, row_index):
     return image.crop((0, top, width, bottom))
 
 
+def _to_fixed(value):
+    """Convert a coordinate to the 16.16 fixed point PIL uses for NEAREST affine sampling."""
+    return int(np.floor(value * 65536.0 + 0.5))
+
+
+@lru_cache(maxsize=64)
+def _shear_offsets(height, width, shear_amount, direction):
+    """
+    Compute the per-row source x-offset of a horizontal shear.
+
+    Sampling happens at pixel centers in 16.16 fixed point, reproducing
+    PIL's AFFINE/NEAREST transform exactly. Offsets only depend on the row
+    size and shear, so they are computed once per batch of same-sized sheets.
+
+    Returns:
+        tuple: Integer offset for each of the `height` rows, clamped to +/- width
+    """
+    if direction in ['ne', 'se']:
+        # Shear right for east diagonals
+        slope, offset = shear_amount, 0.0
+    else:
+        # Shear left for west diagonals
+        slope, offset = -shear_amount, width * shear_amount
+
+    start = _to_fixed(offset + slope * 0.5 + 0.5)
+    shifts = (start + np.arange(height, dtype=np.int64) * _to_fixed(slope)) >> 16
+    return tuple(np.clip(shifts, -width, width).tolist())
+
+
+def _shear_rows(arr, shear_amount, direction):
+    """
+    Shear an RGBA array horizontally by shifting each pixel row as a whole.
+    The shear is a pure integer row shift, so no general resampler is needed.
+
+    Args:
+        arr: np.ndarray of shape (H, W, 4)
+        shear_amount: Horizontal shear amount
+        direction: Diagonal direction ('ne', 'nw', 'se', 'sw')
+
+    Returns:
+        np.ndarray: Sheared array, transparent where no source pixel exists
+    """
+    height, width = arr.shape[:2]
+    shifts = _shear_offsets(height, width, shear_amount, direction)
+
+    # Output column x reads source column x + shift; each row is one slice copy
+    out = np.zeros_like(arr)
+    for y, shift in enumerate(shifts):
+        if shift >= 0:
+            out[y, :width - shift] = arr[y, shift:]
+        else:
+            out[y, -shift:] = arr[y, :width + shift]
+    return out
+
+
 def generate_diagonal(image, direction='ne', shear_amount=DIAGONAL_SHEAR_AMOUNT):
     """
     DEPRECATED: Use generate_blended_diagonal instead.
@@ -184,70 +365,43 @@ def generate_blended_diagonal(image, direction='ne', shear_amount=DIAGONAL_SHEAR
     This method maintains perfect layer alignment for paper doll systems.
 
     Args:
-        image: PIL.Image (LPC format with 4 rows: S, W, N, E)
+        image: PIL.Image or RGBA np.ndarray (LPC format with 4 rows: S, W, N, E)
         direction: Target diagonal direction ('ne', 'nw', 'se', 'sw')
         shear_amount: Horizontal shear amount (default 0.15)
 
     Returns:
-        PIL.Image: Diagonal sprite row with all frames preserved
+        PIL.Image or np.ndarray: Diagonal sprite row with all frames preserved,
+        of the same type as `image`
     """
-    width, height = image.size
+    is_array = isinstance(image, np.ndarray)
+    height = image.shape[0] if is_array else image.height
 
     # Check if this is a 4-row LPC sprite sheet
     is_lpc_format = height % 4 == 0 and height >= 256
 
-    if not is_lpc_format:
-        # Single row image - apply shear directly
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
+    if is_lpc_format:
+        # Use North row (walking up/away - back view) for NE/NW,
+        # South row (walking down/toward - front view) for SE/SW
+        row_index = 2 if direction in ['ne', 'nw'] else 0
+        image = extract_sprite_row(image, row_index)
 
-        img_width = image.width
-        if direction in ['ne', 'se']:
-            matrix = (1, shear_amount, 0, 0, 1, 0)  # Shear right
-        else:
-            matrix = (1, -shear_amount, img_width * shear_amount, 0, 1, 0)  # Shear left
-
-        return image.transform(
-            image.size,
-            Image.AFFINE,
-            matrix,
-            resample=Image.NEAREST,
-            fillcolor=(0, 0, 0, 0)
-        )
-
-    # Extract base row based on direction
-    row_height = height // 4
-    if direction in ['ne', 'nw']:
-        # Use North row (walking up/away - back view)
-        base_row = image.crop((0, row_height * 2, width, row_height * 3))
-    else:
-        # Use South row (walking down/toward - front view)
-        base_row = image.crop((0, 0, width, row_height))
+    if is_array:
+        # Arrays are expected to be RGBA, like everything process_image loads
+        assert image.ndim == 3 and image.shape[2] == 4, "expected an RGBA array"
+        return _shear_rows(image, shear_amount, direction)
 
-    if base_row.mode != 'RGBA':
-        base_row = base_row.convert('RGBA')
+    # Single row images are sheared directly; cropping first means only
+    # the base row is ever converted and copied
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
 
     # Apply horizontal shear transformation
-    row_width = base_row.width
-    if direction in ['ne', 'se']:
-        # Shear right for east diagonals
-        matrix = (1, shear_amount, 0, 0, 1, 0)
-    else:
-        # Shear left for west diagonals
-        matrix = (1, -shear_amount, row_width * shear_amount, 0, 1, 0)
-
-    transformed = base_row.transform(
-        base_row.size,
-        Image.AFFINE,
-        matrix,
-        resample=Image.NEAREST,
-        fillcolor=(0, 0, 0, 0)
-    )
+    transformed = _shear_rows(np.asarray(image), shear_amount, direction)
 
-    return transformed
+    return Image.fromarray(transformed, 'RGBA')
 
 
-def generate_diagonal_variant(source_file, output_file, direction='ne', use_blending=True):
+def generate_diagonal_variant(source_file, output_file, direction='ne', use_blending=True, fast=False, ensure_dir=True):
     """
     Generate a diagonal variant of a single sprite.
 
@@ -256,6 +410,8 @@ def generate_diagonal_variant(source_file, output_file, direction='ne', use_blen
         output_file: Path to output file
         direction: Diagonal direction
         use_blending: If True, blend two cardinal directions for more accurate 8-dir (default: True)
+        fast: If True, favor PNG encode speed over file size (see save_image)
+        ensure_dir: If False, assume the output directory already exists
     """
     blend_mode = "BLENDED" if use_blending else "SIMPLE"
     print(f"\n[DIAGONAL-{blend_mode}] Generating {direction.upper()} diagonal view")
@@ -265,7 +421,7 @@ def generate_diagonal_variant(source_file, output_file, direction='ne', use_blen
     if use_blending:
         print(f"   Mode: Blending two cardinal directions for true 8-directional")
 
-    # Load image
+    # Load image; only the cropped base row is converted to an array
     img = process_image(source_file)
     if img is None:
         return
@@ -277,7 +433,7 @@ def generate_diagonal_variant(source_file, output_file, direction='ne', use_blen
         diagonal = generate_diagonal(img, direction)
 
     # Save
-    save_image(diagonal, Path(output_file))
+    save_image(diagonal, Path(output_file), fast=fast, ensure_dir=ensure_dir)
 
     print(f"[SUCCESS] Diagonal generation complete!")
 
@@ -306,10 +462,18 @@ def batch_process_folder(source_folder, output_folder, operation='recolor', **kw
         source_path = Path(source_folder)
         output_path = Path(output_folder)
 
+        jobs = []
         for img_file in source_path.rglob("*.png"):
             relative_path = img_file.relative_to(source_path)
             output_file = output_path / relative_path.parent / f"{relative_path.stem}_diagonal.png"
-            generate_diagonal_variant(img_file, output_file, direction)
+            jobs.append((img_file, output_file))
+
+        # Create each output directory once up front instead of once per file
+        for directory in {output_file.parent for _, output_file in jobs}:
+            directory.mkdir(parents=True, exist_ok=True)
+
+        for img_file, output_file in jobs:
+            generate_diagonal_variant(img_file, output_file, direction, fast=True, ensure_dir=False)
 
 
 # =============================================================================
@@ -317,6 +481,9 @@ def batch_process_folder(source_folder, output_folder, operation='recolor', **kw
 # =============================================================================
 
 def main():
+    # Only the CLI needs argparse; keep importing this module cheap for library use
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='Antigravity Pipeline - Manipulate LPC sprite sheets'
     )
@@ -355,10 +522,12 @@ def main():
         generate_recolor_variant(args.source, args.output, old_colors, new_color)
 
     elif args.command == 'diagonal':
-        if os.path.isfile(args.source):
-            generate_diagonal_variant(args.source, args.output, args.direction)
+        source = Path(args.source)
+        output = Path(args.output)
+        if source.is_file():
+            generate_diagonal_variant(source, output, args.direction)
         else:
-            batch_process_folder(args.source, args.output, 'diagonal', direction=args.direction)
+            batch_process_folder(source, output, 'diagonal', direction=args.direction)
 
     else:
         parser.print_help()
@@ -7,34 +7,73 @@ Scans sprite sheets and automatically adds missing entries to JSON definitions.
 import os
 import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 import argparse
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json module is used without it
+    orjson = None
+
 # Default paths
 DEFAULT_SPRITESHEET_DIR = "lpc_generator/spritesheets"
 DEFAULT_DEFINITIONS_DIR = "lpc_generator/sheet_definitions"
 BACKUP_DIR = "backups/json_definitions"
+BACKUP_PATH = Path(BACKUP_DIR)
+
+# Sprite file stems recognized as gender variants
+VALID_GENDERS = frozenset(('male', 'female', 'universal'))
+
+# Layout of one injected definition entry, matching save_json's indent=2 output
+ENTRY_TEMPLATE = (
+    '  {{\n'
+    '    "name": {name},\n'
+    '    "file": {file},\n'
+    '    "layer": {layer},\n'
+    '    "gender": {gender}\n'
+    '  }}'
+)
 
 
-def create_backup(file_path):
+def create_backup(file_path, timestamp=None):
     """
     Create a timestamped backup of a JSON file before modification.
 
+    The backup may be a hard link to the live file, so only call this right
+    before the file is replaced (see _write_replacing); until then the two
+    names share the same data.
+
     Args:
         file_path: Path to the file to backup
+        timestamp: Timestamp string shared by a batch of backups. When
+            omitted, the current time is used and the backup directory
+            is created if needed.
 
     Returns:
         Path to backup file
     """
-    backup_dir = Path(BACKUP_DIR)
-    backup_dir.mkdir(parents=True, exist_ok=True)
+    if timestamp is None:
+        BACKUP_PATH.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_name = f"{Path(file_path).stem}_{timestamp}.json"
-    backup_path = backup_dir / backup_name
+    backup_path = BACKUP_PATH / backup_name
 
-    shutil.copy2(file_path, backup_path)
+    try:
+        # A hard link is a metadata-only backup; _write_replacing swaps in a
+        # new file instead of rewriting this one, so the link keeps the old data
+        os.link(file_path, backup_path)
+    except FileExistsError:
+        # Backup from the same second: overwrite it unless it already
+        # links to this very file
+        if not os.path.samefile(file_path, backup_path):
+            shutil.copy2(file_path, backup_path)
+    except OSError:
+        # Cross-device or filesystem without hard link support
+        shutil.copy2(file_path, backup_path)
     print(f"  [BACKUP] Created: {backup_path}")
 
     return backup_path
@@ -43,25 +82,123 @@ def create_backup(file_path):
 def load_json(file_path):
     """Load and parse a JSON file."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        # Read raw bytes through a 64KB buffer to keep read() syscalls few;
+        # both parsers decode UTF-8 bytes directly
+        with open(file_path, 'rb', buffering=65536) as f:
+            raw = f.read()
+
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
     except Exception as e:
         print(f"Error loading {file_path}: {e}")
         return None
 
 
-def save_json(file_path, data):
-    """Save data to a JSON file with pretty formatting."""
+def _write_replacing(file_path, chunks, backup_timestamp=None):
+    """
+    Write byte chunks to a temporary file that then replaces the target, so
+    hard-linked backups of the previous version stay intact.
+
+    Args:
+        file_path: Path to the file to write
+        chunks: Iterable of bytes making up the new file contents; it is
+            consumed while writing, so it may be a generator
+        backup_timestamp: If given and the file exists, back it up with
+            this timestamp just before it is replaced
+
+    Returns:
+        bool: True on success, False if the file could not be written
+    """
+    tmp_path = f"{file_path}.tmp"
+    backup_path = None
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(tmp_path, 'wb') as f:
+            f.writelines(chunks)
+        if backup_timestamp is not None and os.path.exists(file_path):
+            backup_path = create_backup(file_path, backup_timestamp)
+        os.replace(tmp_path, file_path)
         print(f"  [OK] Updated: {file_path}")
         return True
     except Exception as e:
         print(f"Error saving {file_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        # The original stayed in place, so a hard-linked backup would just
+        # be a second name for the live file
+        if backup_path is not None and os.path.samefile(file_path, backup_path):
+            os.remove(backup_path)
         return False
 
 
+def save_json(file_path, data, backup_timestamp=None):
+    """
+    Save data to a JSON file with pretty formatting.
+
+    Args:
+        file_path: Path to the JSON file
+        data: Data to serialize
+        backup_timestamp: If given, back up the existing file with this
+            timestamp before replacing it
+    """
+    if orjson is not None:
+        try:
+            # Same layout as json.dump(indent=2, ensure_ascii=False)
+            chunks = (orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS),)
+        except Exception as e:
+            print(f"Error saving {file_path}: {e}")
+            return False
+    else:
+        # Stream encoded chunks into the buffered file instead of
+        # building the whole document in memory first
+        encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+        chunks = (chunk.encode('utf-8') for chunk in encoder.iterencode(data))
+    return _write_replacing(file_path, chunks, backup_timestamp)
+
+
+def append_json_entries(file_path, entries, backup_timestamp=None):
+    """
+    Append injected entries to an existing JSON array file without parsing
+    and re-serializing the entries already in it.
+
+    Args:
+        file_path: Path to a JSON file holding a top-level array
+        entries: Entry dicts with 'name', 'file', 'layer' and 'gender' keys
+        backup_timestamp: If given, back up the existing file with this
+            timestamp before replacing it
+
+    Returns:
+        bool: True if the entries were appended, False if the file does not
+        look like a JSON array or could not be written
+    """
+    try:
+        with open(file_path, 'rb', buffering=65536) as f:
+            raw = f.read()
+    except Exception as e:
+        print(f"Error saving {file_path}: {e}")
+        return False
+
+    # Splice the new entries in just before the closing bracket
+    end = raw.rfind(b']')
+    if not raw.lstrip().startswith(b'[') or end == -1 or raw[end + 1:].strip():
+        return False
+
+    body = raw[:end].rstrip()
+    separator = b'\n' if body.endswith(b'[') else b',\n'
+    rendered = ',\n'.join(
+        ENTRY_TEMPLATE.format(**{
+            key: json.dumps(entry[key], ensure_ascii=False)
+            for key in ('name', 'file', 'layer', 'gender')
+        })
+        for entry in entries
+    )
+    return _write_replacing(
+        file_path,
+        (body, separator, rendered.encode('utf-8'), b'\n]'),
+        backup_timestamp,
+    )
+
+
 def scan_spritesheet_directory(spritesheet_dir):
     """
     Scan the spritesheet directory and return a structured inventory.
@@ -75,45 +212,50 @@ def scan_spritesheet_directory(spritesheet_dir):
             }
         }
     """
-    spritesheet_path = Path(spritesheet_dir)
-
-    if not spritesheet_path.exists():
+    if not os.path.isdir(spritesheet_dir):
         print(f"Error: Spritesheet directory '{spritesheet_dir}' not found.")
         return {}
 
     inventory = {}
 
-    # Walk through the spritesheet directory
+    # Walk through the spritesheet directory in a single os.walk (scandir
+    # based, so entry types come without extra stat() calls)
     # Expected structure: spritesheets/[category]/[item_name]/[gender].png
-    for category_dir in spritesheet_path.iterdir():
-        if not category_dir.is_dir():
+    # Paths are reported relative to the spritesheet directory's parent,
+    # always with forward slashes
+    root_name = Path(spritesheet_dir).name
+    prefix = f"{root_name}/" if root_name else ""
+    top = os.path.join(spritesheet_dir, '')
+
+    for dirpath, dirnames, filenames in os.walk(top, followlinks=True):
+        relative_dir = dirpath[len(top):]
+
+        if not relative_dir:
+            # Skip special directories
+            dirnames[:] = [d for d in dirnames if not d.startswith(('.', '_'))]
             continue
 
-        category = category_dir.name
-
-        # Skip special directories
-        if category.startswith('.') or category.startswith('_'):
+        if os.sep not in relative_dir:
+            # Category folder: descend into its item folders
             continue
 
-        # Look for item folders within category
-        for item_dir in category_dir.iterdir():
-            if not item_dir.is_dir():
-                continue
+        # Item folder: collect its sprites and stop descending
+        dirnames.clear()
 
-            item_name = item_dir.name
-            key = f"{category}/{item_name}"
+        category, item_name = relative_dir.split(os.sep)
+        key = f"{category}/{item_name}"
+        sprites = inventory.setdefault(key, {})
 
-            if key not in inventory:
-                inventory[key] = {}
+        # Look for gender-specific or universal sprites
+        for sprite_name in filenames:
+            if not sprite_name.endswith('.png'):
+                continue
 
-            # Look for gender-specific or universal sprites
-            for sprite_file in item_dir.glob("*.png"):
-                gender = sprite_file.stem.lower()  # 'male', 'female', 'universal'
+            gender = sprite_name[:-4].lower()  # 'male', 'female', 'universal'
 
-                # Determine gender
-                if gender in ['male', 'female', 'universal']:
-                    relative_path = sprite_file.relative_to(spritesheet_path.parent)
-                    inventory[key][gender] = str(relative_path).replace('\\', '/')
+            # Determine gender
+            if gender in VALID_GENDERS:
+                sprites[gender] = f"{prefix}{key}/{sprite_name}"
 
     return inventory
 
@@ -124,9 +266,7 @@ def scan_definitions(definitions_dir):
 
     Returns:
         dict: {
-            'category': {
-                'item_name_gender': True
-            }
+            'category': {'path/to/registered.png', ...}
         }
     """
     definitions_path = Path(definitions_dir)
@@ -137,26 +277,26 @@ def scan_definitions(definitions_dir):
 
     registered = {}
 
-    # Scan all JSON files in definitions directory
-    for json_file in definitions_path.glob("*.json"):
-        category = json_file.stem
+    # Scan all JSON files in definitions directory; loading is mostly I/O,
+    # so read them in parallel and merge the results here
+    json_files = list(definitions_path.glob("*.json"))
+    with ThreadPoolExecutor(max_workers=min(8, len(json_files) or 1)) as executor:
+        loaded = list(executor.map(load_json, json_files))
 
-        data = load_json(json_file)
+    for json_file, data in zip(json_files, loaded):
         if data is None:
             continue
 
-        registered[category] = {}
-
-        # Parse existing entries
-        for entry in data:
-            if isinstance(entry, dict) and 'name' in entry and 'file' in entry:
-                # Create a unique key from file path
-                file_path = entry.get('file', '')
-                registered[category][file_path] = True
+        # Parse existing entries, keyed by their file path
+        registered[json_file.stem] = {
+            entry['file'] for entry in data
+            if isinstance(entry, dict) and 'name' in entry and 'file' in entry
+        }
 
     return registered
 
 
+@lru_cache(maxsize=2048)
 def generate_display_name(item_folder_name):
     """
     Convert a folder name to a human-readable display name.
@@ -191,17 +331,12 @@ def inject_missing_entries(spritesheet_dir, definitions_dir, dry_run=False):
 
     for key, genders in inventory.items():
         category, item_name = key.split('/', 1)
-
-        if category not in registered:
-            registered[category] = {}
+        registered_files = registered.get(category, ())
 
         for gender, file_path in genders.items():
             # Check if this file path is already registered
-            if file_path not in registered[category]:
-                if category not in missing_entries:
-                    missing_entries[category] = []
-
-                missing_entries[category].append({
+            if file_path not in registered_files:
+                missing_entries.setdefault(category, []).append({
                     'name': generate_display_name(item_name),
                     'file': file_path,
                     'layer': category,
@@ -226,12 +361,21 @@ def inject_missing_entries(spritesheet_dir, definitions_dir, dry_run=False):
     # Inject entries
     print("\n[INJECT] Adding missing entries to JSON definitions...")
 
+    # One timestamp and one backup directory check for the whole batch
+    batch_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    BACKUP_PATH.mkdir(parents=True, exist_ok=True)
+    definitions_path = Path(definitions_dir)
+
     for category, entries in missing_entries.items():
-        json_file = Path(definitions_dir) / f"{category}.json"
+        json_file = definitions_path / f"{category}.json"
 
         # Load existing data
         if json_file.exists():
-            create_backup(json_file)
+            # Files that parsed during the scan only need the new entries
+            # appended, not a full load and re-save
+            if category in registered and append_json_entries(json_file, entries, batch_timestamp):
+                continue
+
             data = load_json(json_file)
             if data is None:
                 print(f"   [WARNING] Skipping {category} due to load error")
@@ -243,8 +387,8 @@ def inject_missing_entries(spritesheet_dir, definitions_dir, dry_run=False):
         # Append new entries
         data.extend(entries)
 
-        # Save
-        save_json(json_file, data)
+        # Save, backing up the previous version just before it is replaced
+        save_json(json_file, data, batch_timestamp)
 
     print("\n[SUCCESS] JSON injection complete!")
 
@@ -5,13 +5,30 @@ Serves the lpc_generator directory on localhost:8000.
 """
 
 import http.server
-import socketserver
 import os
 import sys
 
 PORT = 8000
 DIRECTORY = "lpc_generator"
 
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    # Keep-alive lets the browser reuse connections for the many sprite fetches
+    protocol_version = "HTTP/1.1"
+
+    def copyfile(self, source, outputfile):
+        # Let the kernel copy file bodies straight to the socket (sendfile);
+        # socket.sendfile falls back to plain send() when that's unavailable
+        outputfile.flush()
+        self.connection.sendfile(source)
+
+
+class Server(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    # A page load opens many connections at once; don't refuse the burst
+    request_queue_size = 128
+
+
 def main():
     # Change to the lpc_generator directory
     if not os.path.exists(DIRECTORY):
@@ -21,9 +38,8 @@ def main():
 
     os.chdir(DIRECTORY)
 
-    Handler = http.server.SimpleHTTPRequestHandler
-
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    # Serve requests concurrently so one slow download doesn't stall the page
+    with Server(("", PORT), Handler) as httpd:
         print(f"Server running at http://localhost:{PORT}/")
         print(f"Serving directory: {os.getcwd()}")
         print("Press Ctrl+C to stop the server")